@@ -1,70 +1,247 @@
 import streamlit as st
 import json
+import math
+import re
 import time
-from PIL import Image
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import Callable, List, Dict, FrozenSet, Optional, Tuple, Union
 
-@dataclass
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from turing_kernel import build_kernel_tables, run_kernel
+
+MAX_STEPS = 10_000_000
+MAX_TAPE_CELLS = 65_536
+FRAME_INTERVAL = 0.05
+MAX_FRAMES = 120
+CYCLE_CHECK_TAPE_LIMIT = 256
+CYCLE_CHECK_INTERVAL = 1024
+CODEGEN_MAX_TRANSITIONS = 16
+TAPE_WINDOW = 41
+TAPE_PADDING = 512
+HEAD_MOVES = {"LEFT": -1, "RIGHT": 1}
+UNARY_RE = re.compile(r"1*")
+BINARY_RE = re.compile(r"[01]*")
+ZERO_RE = re.compile(r"0*")
+UTM_PREFIX = b"1.+= . ABC aA1B.> bB1B1> bB+B1> bB=C.> #"
+UTM_SUFFIX = b" @"
+FAST_DECIDERS = {
+    "is_palindrome": lambda s: s == s[::-1],
+    "02n": lambda s: s.count("0") % 2 == 0,
+    "0n1n": lambda s: len(s) % 2 == 0 and s == "0" * (len(s) // 2) + "1" * (len(s) // 2),
+}
+
+@dataclass(slots=True)
 class TuringState:
-    tape: List[str]
+    tape: Union[bytearray, "np.ndarray"]
     head: int
-    state: str
+    state: int
+    lo: int
+    hi: int
+
+    @property
+    def logical_tape(self) -> Union[bytearray, "np.ndarray"]:
+        return self.tape[self.lo:self.hi]
 
-@dataclass
+    @property
+    def logical_head(self) -> int:
+        return self.head - self.lo
+
+@dataclass(slots=True)
 class TuringConfig:
     name: str
-    alphabet: List[str]
+    alphabet_set: FrozenSet[str]
     blank: str
     states: List[str]
     initial: str
-    finals: List[str]
-    transitions: Dict[str, List[Dict[str, str]]]
+    state_ids: Dict[str, int]
+    blank_code: int
+    final_ids: FrozenSet[int]
+    lut: List[List[Optional[Tuple[int, int, int]]]]
+    kernel_tables: Optional[Tuple["np.ndarray", ...]] = None
+    run_fn: Optional[Callable] = None
+
+def _load_raw(path: str) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def _compile_run_loop(lut: List[List[Optional[Tuple[int, int, int]]]], final_ids: FrozenSet[int], blank_code: int) -> Optional[Callable]:
+    branches = [
+        (state_id, [(code, entry) for code, entry in enumerate(row) if entry is not None])
+        for state_id, row in enumerate(lut) if state_id not in final_ids
+    ]
+    branches = [(state_id, entries) for state_id, entries in branches if entries]
+    if not branches or sum(len(entries) for _, entries in branches) > CODEGEN_MAX_TRANSITIONS:
+        return None
+
+    src = [
+        "def run(tape, head, state, lo, hi, max_steps):",
+        "    for steps in range(max_steps):",
+    ]
+    for i, (state_id, entries) in enumerate(branches):
+        src += [
+            f"        {'if' if i == 0 else 'elif'} state == {state_id}:",
+            "            if head < lo:",
+            "                if head < 0:",
+            "                    grow = len(tape)",
+            "                    tape[:0] = BLANK * grow",
+            "                    head += grow",
+            "                    hi += grow",
+            "                lo = head",
+            "            elif head >= hi:",
+            "                if head >= len(tape):",
+            "                    tape += BLANK * len(tape)",
+            "                hi = head + 1",
+            "            symbol = tape[head]",
+        ]
+        for j, (code, (write, to_state, delta)) in enumerate(entries):
+            src.append(f"            {'if' if j == 0 else 'elif'} symbol == {code}:")
+            if write != code:
+                src.append(f"                tape[head] = {write}")
+            src.append(f"                head {'+' if delta > 0 else '-'}= 1")
+            if to_state != state_id:
+                src.append(f"                state = {to_state}")
+        src += [
+            "            else:",
+            "                return tape, head, state, lo, hi, steps",
+        ]
+    src += [
+        "        else:",
+        "            return tape, head, state, lo, hi, steps",
+        "    return tape, head, state, lo, hi, max_steps",
+    ]
+    namespace = {"BLANK": bytes([blank_code])}
+    exec(compile("\n".join(src), "<turing-machine>", "exec"), namespace)
+    return namespace["run"]
 
+@st.cache_resource(show_spinner=False)
 def load_machine_config(name: str, is_utm: bool = False) -> TuringConfig:
     filename = f"utm_{name}.json" if is_utm else f"{name}.json"
-    with open(f"machines/{filename}", "r") as f:
-        data = json.load(f)
-        return TuringConfig(
-            name=data["name"],
-            alphabet=data["alphabet"],
-            blank=data["blank"],
-            states=data["states"],
-            initial=data["initial"],
-            finals=data["finals"],
-            transitions=data["transitions"]
-        )
+    data = _load_raw(f"machines/{filename}")
+    # Reversed so that the first rule listed for a symbol wins.
+    transitions = {
+        from_state: {
+            t["read"]: (t["write"], t["to_state"], HEAD_MOVES[t["action"]])
+            for t in reversed(rules)
+        }
+        for from_state, rules in data["transitions"].items()
+    }
+    state_ids = {s: i for i, s in enumerate(data["states"])}
+    lut = [[None] * 256 for _ in data["states"]]
+    for from_state, by_symbol in transitions.items():
+        row = lut[state_ids[from_state]]
+        for read, (write, to_state, delta) in by_symbol.items():
+            row[ord(read)] = (ord(write), state_ids[to_state], delta)
+    final_ids = frozenset(state_ids[f] for f in data["finals"])
+    return TuringConfig(
+        name=data["name"],
+        alphabet_set=frozenset(data["alphabet"]),
+        blank=data["blank"],
+        states=data["states"],
+        initial=data["initial"],
+        state_ids=state_ids,
+        blank_code=ord(data["blank"]),
+        final_ids=final_ids,
+        lut=lut,
+        kernel_tables=build_kernel_tables(lut, final_ids) if run_kernel is not None else None,
+        run_fn=_compile_run_loop(lut, final_ids, ord(data["blank"])) if run_kernel is None else None
+    )
 
-def validate_input(input_str: str, alphabet: List[str]) -> bool:
-    return all(c in alphabet for c in input_str)
+def validate_input(input_str: str, alphabet: FrozenSet[str]) -> bool:
+    return alphabet.issuperset(input_str)
 
-def step_machine(config: TuringConfig, state: TuringState) -> Optional[TuringState]:
-    if state.head < 0:
-        state.tape.insert(0, config.blank)
-        state.head = 0
-    elif state.head >= len(state.tape):
-        state.tape.append(config.blank)
+def create_initial_state(config: TuringConfig, input_str: Union[str, bytes]) -> TuringState:
+    if isinstance(input_str, str):
+        input_str = input_str.encode("ascii")
+    pad = max(len(input_str), TAPE_PADDING)
+    blank = bytes([config.blank_code]) * pad
+    return TuringState(
+        tape=bytearray(blank + input_str + blank),
+        head=pad,
+        state=config.state_ids[config.initial],
+        lo=pad,
+        hi=pad + len(input_str)
+    )
 
-    current_symbol = state.tape[state.head]
-    transitions = config.transitions.get(state.state, [])
-    transition = next((t for t in transitions if t["read"] == current_symbol), None)
-    
-    if not transition:
-        return None
-        
-    state.tape[state.head] = transition["write"]
-    state.state = transition["to_state"]
-    state.head += 1 if transition["action"] == "RIGHT" else -1
-    
-    return state
+def decode_tape(tape: Union[bytearray, "np.ndarray"]) -> str:
+    return bytes(tape).decode("ascii")
+
+def _run_lut(config: TuringConfig, tape: bytearray, head: int, state: int, lo: int, hi: int, max_steps: int):
+    lut = config.lut
+    final_ids = config.final_ids
+    blank = bytes([config.blank_code])
+    steps = 0
+    while steps < max_steps and state not in final_ids:
+        if head < lo:
+            if head < 0:
+                grow = len(tape)
+                tape[:0] = blank * grow
+                head += grow
+                hi += grow
+            lo = head
+        elif head >= hi:
+            if head >= len(tape):
+                tape += blank * len(tape)
+            hi = head + 1
 
-def get_utm_tape_for_unary_add(input_str: str) -> str:
-    utm_prefix = "1.+= . ABC aA1B.> bB1B1> bB+B1> bB=C.> #"
-    utm_suffix = " @"
-    return f"{utm_prefix}{input_str}{utm_suffix}"
+        entry = lut[state][tape[head]]
+        if entry is None:
+            break
+        tape[head], state, delta = entry
+        head += delta
+        steps += 1
+    return tape, head, state, lo, hi, steps
+
+def check_progress(state: TuringState, steps: int, seen: set, max_steps: int) -> None:
+    if steps >= max_steps:
+        raise RuntimeError(f"Step limit of {max_steps} reached before the machine halted")
+    if state.hi - state.lo > MAX_TAPE_CELLS:
+        raise RuntimeError(f"Tape grew past {MAX_TAPE_CELLS} cells before the machine halted")
+    if state.hi - state.lo <= CYCLE_CHECK_TAPE_LIMIT:
+        configuration = (state.state, state.logical_head, bytes(state.logical_tape))
+        if configuration in seen:
+            raise RuntimeError(f"Machine entered an infinite loop after {steps} steps")
+        seen.add(configuration)
+
+def advance(config: TuringConfig, state: TuringState, max_steps: int) -> Tuple[TuringState, int, bool]:
+    if config.kernel_tables is not None:
+        tape, lo, hi, head, state_id, steps, halted = run_kernel(
+            state.tape, state.lo, state.hi, state.head, state.state,
+            config.kernel_tables, config.blank_code, max_steps
+        )
+        state = TuringState(tape=tape, head=int(head), state=int(state_id), lo=int(lo), hi=int(hi))
+        return state, steps, halted or steps < max_steps
 
-def render_tape(tape: List[str], head: int, state: str) -> str:
-    css = """
+    if config.run_fn is not None:
+        tape, head, state_id, lo, hi, steps = config.run_fn(
+            state.tape, state.head, state.state, state.lo, state.hi, max_steps
+        )
+    else:
+        tape, head, state_id, lo, hi, steps = _run_lut(
+            config, state.tape, state.head, state.state, state.lo, state.hi, max_steps
+        )
+    halted = state_id in config.final_ids or steps < max_steps
+    return TuringState(tape=tape, head=head, state=state_id, lo=lo, hi=hi), steps, halted
+
+def simulate(config: TuringConfig, state: TuringState, max_steps: int = MAX_STEPS) -> Tuple[TuringState, int]:
+    steps = 0
+    seen = set()
+    halted = state.state in config.final_ids
+    while not halted:
+        check_progress(state, steps, seen, max_steps)
+        state, taken, halted = advance(config, state, min(CYCLE_CHECK_INTERVAL, max_steps - steps))
+        steps += taken
+    return state, steps
+
+def get_utm_tape_for_unary_add(input_str: str) -> bytes:
+    return UTM_PREFIX + input_str.encode("ascii") + UTM_SUFFIX
+
+TAPE_CSS = """
     <style>
         .turing-tape {
             font-family: monospace;
@@ -118,14 +295,22 @@ def render_tape(tape: List[str], head: int, state: str) -> str:
         }
     </style>
     """
+
+# Only lasts for one script run, since Streamlit re-executes the module on every rerun.
+@lru_cache(maxsize=64)
+def _cell(symbol: str, is_current: bool) -> str:
+    return f'<div class="cell{" current" if is_current else ""}">{symbol}</div>'
+
+def render_tape(tape: str, head: int, state: str, blank: str, window: Optional[int] = None) -> str:
+    if window is not None and len(tape) > window:
+        start = head - window // 2
+        tape = blank * max(0, -start) + tape[max(start, 0):start + window]
+        tape += blank * (window - len(tape))
+        head = window // 2
     
-    cells_html = ""
-    for i, symbol in enumerate(tape):
-        current_class = "current" if i == head else ""
-        cells_html += f'<div class="cell {current_class}">{symbol}</div>'
+    cells_html = "".join([_cell(symbol, i == head) for i, symbol in enumerate(tape)])
     
     tape_html = f"""
-    {css}
     <div class="turing-tape">
         <div class="state-display">Current State: {state}</div>
         <div class="tape-cells">
@@ -136,16 +321,12 @@ def render_tape(tape: List[str], head: int, state: str) -> str:
     
     return tape_html
 
-def create_machine_input(machine_name: str) -> Tuple[Optional[str], bool]:
-    st.markdown("""
-        <style>
-        .stRadio > label {
-            font-size: 1.2rem;
-            color: #DDD;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+@st.cache_resource(show_spinner=False)
+def load_image(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
 
+def create_machine_input(machine_name: str) -> Tuple[Optional[str], bool]:
     is_utm = False
     if machine_name == "unary_add":
         is_utm = st.radio(
@@ -172,7 +353,7 @@ def create_machine_input(machine_name: str) -> Tuple[Optional[str], bool]:
             st.markdown('<div class="operator">=</div>', unsafe_allow_html=True)
         
         if num1 and num2:
-            if not all(c == "1" for c in num1 + num2):
+            if not UNARY_RE.fullmatch(num1 + num2):
                 st.error("Please use only '1's for unary numbers")
                 return None, False
             input_str = f"{num1}{'+'if machine_name == 'unary_add' else '-'}{num2}="
@@ -181,7 +362,7 @@ def create_machine_input(machine_name: str) -> Tuple[Optional[str], bool]:
     elif machine_name == "is_palindrome":
         input_str = st.text_input("Enter a binary string (1 or 0):", 
                                  help="Use only 0s and 1s (e.g., 1001)")
-        if input_str and not all(c in ["0", "1"] for c in input_str):
+        if input_str and not BINARY_RE.fullmatch(input_str):
             st.error("Please use only 0s and 1s")
             return None, False
         return input_str, False
@@ -189,7 +370,7 @@ def create_machine_input(machine_name: str) -> Tuple[Optional[str], bool]:
     elif machine_name == "02n":
         input_str = st.text_input("Enter a string of zeros:",
                                  help="Use only 0s (e.g., 0000)")
-        if input_str and not all(c == "0" for c in input_str):
+        if input_str and not ZERO_RE.fullmatch(input_str):
             st.error("Please use only 0s")
             return None, False
         return input_str, False
@@ -197,22 +378,90 @@ def create_machine_input(machine_name: str) -> Tuple[Optional[str], bool]:
     elif machine_name == "0n1n":
         input_str = st.text_input("Enter a string of zeros and ones (start with 0):",
                                  help="Use 0s followed by 1s (e.g., 00111)")
-        if (input_str and not all(c in ["0", "1"] for c in input_str)) or (input_str and not input_str.startswith("0")):
+        if (input_str and not BINARY_RE.fullmatch(input_str)) or (input_str and not input_str.startswith("0")):
             st.error("Please use only 0s and 1s and start with 0s")
             return None, False
         return input_str, False
     
     return None, False
 
-def main():
-    st.set_page_config(
-        page_title="Alan Turing's A-Machine",
-        page_icon="🤖",
-        layout="wide",
-        initial_sidebar_state="collapsed"
-    )
+@st.fragment
+def simulation_panel(machine_name: str, input_str: Optional[str], is_utm: bool) -> None:
+    speed = st.slider("Animation Speed", 
+                     min_value=0.1, 
+                     max_value=100.0, 
+                     value=1.0, 
+                     step=0.1,
+                     help=f"Adjust the speed of the tape animation in frames per second (1.0 is normal speed, 4.0 is 4x faster). Long runs are sampled down to at most {MAX_FRAMES} frames")
+    
+    skip_animation = st.checkbox("Skip animation",
+                                 help="Run the machine to completion and show only the result")
     
-    st.markdown("""
+    col1, col2, col3 = st.columns([2,1,2])
+    with col2:
+        run_button = st.button("Run Machine", use_container_width=True)
+    
+    if run_button:
+        try:
+            config = load_machine_config(machine_name, is_utm)
+            
+            if input_str is None or not validate_input(input_str, config.alphabet_set):
+                st.error("Invalid input for selected machine")
+                return
+                
+            decider = FAST_DECIDERS.get(machine_name)
+            if skip_animation and decider is not None and input_str:
+                st.markdown("""
+                    <div style='text-align: center; margin-top: 2rem;'>
+                        <h2>Input {}</h2>
+                        <h3>Decided directly from the input, without running the machine</h3>
+                    </div>
+                """.format("accepted (y)" if decider(input_str) else "rejected (n)"), unsafe_allow_html=True)
+                return
+                
+            if is_utm:
+                input_str = get_utm_tape_for_unary_add(input_str)
+                
+            vis_placeholder = st.empty()
+            
+            final_state, total_steps = simulate(config, create_initial_state(config, input_str))
+            
+            stride = max(1, math.ceil(total_steps / MAX_FRAMES))
+            strides_per_render = max(1, int(speed * FRAME_INTERVAL))
+            steps_per_render = stride * strides_per_render
+            render_delay = strides_per_render / speed
+            next_render = time.monotonic()
+            steps = total_steps if skip_animation else 0
+            
+            state = final_state if skip_animation else create_initial_state(config, input_str)
+            while True:
+                done = steps >= total_steps
+                vis_placeholder.markdown(
+                    render_tape(decode_tape(state.logical_tape), state.logical_head, config.states[state.state],
+                                config.blank, None if done else TAPE_WINDOW),
+                    unsafe_allow_html=True
+                )
+                if done:
+                    break
+                
+                state, taken, _ = advance(config, state, min(steps_per_render, total_steps - steps))
+                steps += taken
+                next_render += render_delay
+                time.sleep(max(0.0, next_render - time.monotonic()))
+            
+            if final_state.state in config.final_ids:
+                st.markdown("""
+                    <div style='text-align: center; margin-top: 2rem;'>
+                        <h2 style='color: #4CAF50;'>✓ Machine halted!</h2>
+                        <h3>Final result: {}</h3>
+                    </div>
+                """.format(decode_tape(final_state.logical_tape)), unsafe_allow_html=True)
+            else:
+                st.error("Machine encountered an error")
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+
+APP_CSS = """
         <style>
             .stApp {
                 background: #121212;
@@ -266,22 +515,20 @@ def main():
                 border-radius: 10px;
                 box-shadow: 0 4px 8px rgba(0, 0, 0, 0.5);
             }
+            .stRadio > label {
+                font-size: 1.2rem;
+                color: #DDD;
+            }
         </style>
-    """, unsafe_allow_html=True)
+"""
 
-    st.markdown("""
+TITLE_HTML = """
         <div class="title-container">
             <h1>Alan Turing's A-Machine</h1>
         </div>
-    """, unsafe_allow_html=True)
+"""
 
-    # Imagen de Alan Turing
-    col1, col2, col3 = st.columns([2, 1, 2])
-    with col2:
-        st.image("images/turing.jpg", caption="Alan Turing (1912-1954)", use_container_width=True)
-    
-    
-    st.markdown("""
+DESCRIPTION_HTML = """
         <div class="description">
             A Turing Machine is a theoretical computational model introduced by Alan Turing in 1936. It is designed to simulate the logic of any computer algorithm and serves as a fundamental concept in computer science, particularly in the study of computation and complexity.
             <br>
@@ -319,12 +566,32 @@ def main():
             <br>    
             Variants, such as Universal Turing Machines (UTMs), demonstrate how a single machine can simulate any other Turing Machine.
         </div>
-    """, unsafe_allow_html=True)
+"""
+
+
+def main():
+    st.set_page_config(
+        page_title="Alan Turing's A-Machine",
+        page_icon="🤖",
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
+    
+    st.markdown(APP_CSS + TAPE_CSS, unsafe_allow_html=True)
+    st.markdown(TITLE_HTML, unsafe_allow_html=True)
+
+    # Imagen de Alan Turing
+    col1, col2, col3 = st.columns([2, 1, 2])
+    with col2:
+        st.image(load_image("images/turing.jpg"), caption="Alan Turing (1912-1954)", use_container_width=True)
+    
+    
+    st.markdown(DESCRIPTION_HTML, unsafe_allow_html=True)
 
     # Imagen de la máquina de Turing conceptual
     col1, col2, col3 = st.columns([3, 2, 3])
     with col2:
-        st.image("images/turing_machine.jpg", caption="Conceptual Turing Machine", use_container_width=True)
+        st.image(load_image("images/turing_machine.jpg"), caption="Conceptual Turing Machine", use_container_width=True)
     
     machine_name = st.selectbox(
         "Select Turing Machine:",
@@ -338,64 +605,8 @@ def main():
         }[x]
     )
     
-    speed = st.slider("Animation Speed", 
-                     min_value=0.1, 
-                     max_value=10.0, 
-                     value=1.0, 
-                     step=0.1,
-                     help="Adjust the speed of the tape animation (1.0 is normal speed, 4.0 is 4x faster)")
-    
-    input_result = create_machine_input(machine_name)
-    
-    col1, col2, col3 = st.columns([2,1,2])
-    with col2:
-        run_button = st.button("Run Machine", use_container_width=True)
-    
-    if input_result:
-        try:
-            input_str, is_utm = input_result
-            if run_button:
-                config = load_machine_config(machine_name, is_utm)
-                
-                if input_str is None or not validate_input(input_str, config.alphabet):
-                    st.error("Invalid input for selected machine")
-                    return
-                    
-                if is_utm:
-                    input_str = get_utm_tape_for_unary_add(input_str)
-                    
-                state = TuringState(
-                    tape=list(input_str),
-                    head=0,
-                    state=config.initial
-                )
-                
-                vis_placeholder = st.empty()
-                
-                while state and state.state not in config.finals:
-                    vis_placeholder.markdown(
-                        render_tape(state.tape, state.head, state.state),
-                        unsafe_allow_html=True
-                    )
-                    
-                    state = step_machine(config, state)
-                    time.sleep(1.0 / speed)
-                
-                if state:
-                    vis_placeholder.markdown(
-                        render_tape(state.tape, state.head, state.state),
-                        unsafe_allow_html=True
-                    )
-                    st.markdown("""
-                        <div style='text-align: center; margin-top: 2rem;'>
-                            <h2 style='color: #4CAF50;'>✓ Machine halted!</h2>
-                            <h3>Final result: {}</h3>
-                        </div>
-                    """.format("".join(state.tape)), unsafe_allow_html=True)
-                else:
-                    st.error("Machine encountered an error")
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+    input_str, is_utm = create_machine_input(machine_name)
+    simulation_panel(machine_name, input_str, is_utm)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+# Kept out of the Streamlit script, which re-executes on every rerun; the
+# module cache holds the compiled dispatcher for the life of the process.
+from typing import FrozenSet, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+def build_kernel_tables(lut: List[List[Optional[Tuple[int, int, int]]]], final_ids: FrozenSet[int]) -> Tuple["np.ndarray", ...]:
+    write_tbl = np.zeros(len(lut) * 256, dtype=np.uint8)
+    next_tbl = np.zeros(len(lut) * 256, dtype=np.int32)
+    delta_tbl = np.zeros(len(lut) * 256, dtype=np.int8)
+    for state_id, row in enumerate(lut):
+        for code, entry in enumerate(row):
+            if entry is not None:
+                i = state_id * 256 + code
+                write_tbl[i], next_tbl[i], delta_tbl[i] = entry
+    finals_mask = np.zeros(len(lut), dtype=np.bool_)
+    finals_mask[list(final_ids)] = True
+    return write_tbl, next_tbl, delta_tbl, finals_mask
+
+if njit is not None:
+    @njit(cache=True)
+    def _run(tape, lo, hi, head, state, write_tbl, next_tbl, delta_tbl, finals_mask, blank, max_steps):
+        steps = 0
+        while not finals_mask[state]:
+            if steps == max_steps:
+                return tape, lo, hi, head, state, steps, False
+            if head < 0:
+                grown = np.full(2 * tape.size, blank, dtype=tape.dtype)
+                grown[tape.size:] = tape
+                lo += tape.size
+                hi += tape.size
+                head += tape.size
+                tape = grown
+            elif head >= tape.size:
+                grown = np.full(2 * tape.size, blank, dtype=tape.dtype)
+                grown[:tape.size] = tape
+                tape = grown
+            if head < lo:
+                lo = head
+            elif head >= hi:
+                hi = head + 1
+
+            i = state * 256 + tape[head]
+            if delta_tbl[i] == 0:
+                return tape, lo, hi, head, state, steps, False
+            tape[head] = write_tbl[i]
+            head += delta_tbl[i]
+            state = next_tbl[i]
+            steps += 1
+        return tape, lo, hi, head, state, steps, True
+
+    def run_kernel(tape, lo: int, hi: int, head: int, state: int, tables: Tuple["np.ndarray", ...], blank: int, max_steps: int):
+        return _run(np.frombuffer(tape, dtype=np.uint8), lo, hi, head, state, *tables, blank, max_steps)
+else:
+    run_kernel = None